@@ -4,11 +4,8 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import seaborn as sns
-import matplotlib.pyplot as plt
-from PIL import Image
-import io
-from sklearn.preprocessing import LabelEncoder
+import os
+from itertools import combinations
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -24,7 +21,7 @@ st.set_page_config(
 )
 
 # CSS personalizado para el tema morado
-st.markdown("""
+ESTILOS_CSS = """
 <style>
     .main-header {
         background: linear-gradient(90deg, #6a0dad, #9370db);
@@ -76,8 +73,42 @@ st.markdown("""
         margin: 1rem 0;
         border-radius: 5px;
     }
+    .metric-row {
+        display: flex;
+        gap: 1rem;
+    }
+    .metric-row .metric-card {
+        flex: 1;
+    }
+    .metric-label {
+        font-size: 0.875rem;
+        color: #4b0082;
+    }
+    .metric-value {
+        font-size: 1.75rem;
+        font-weight: 600;
+    }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Encabezado principal del dashboard
+ENCABEZADO_HTML = """
+<div class="main-header">
+    <h1>🎭 Dashboard de Análisis Cultural</h1>
+    <p>Análisis Estadístico de Participación Cultural en Colombia</p>
+</div>
+"""
+
+# Estilos y encabezado viajan juntos en un único elemento de markdown
+st.markdown(ESTILOS_CSS + ENCABEZADO_HTML, unsafe_allow_html=True)
+
+# Encuesta original y su copia Parquet (caché en disco de leer_datos_crudos)
+ARCHIVO_DATOS = 'cultura.xlsx'
+ARCHIVO_PARQUET = 'cultura.parquet'
+
+# Verificaciones de desarrollo (CULTURA_DEBUG=1): comprueba al final de cada rerun
+# que ninguna página modificó el DataFrame compartido
+MODO_DEBUG = os.environ.get('CULTURA_DEBUG') == '1'
 
 # =============================================================================
 # FUNCIONES AUXILIARES
@@ -92,6 +123,116 @@ def get_purple_palette(n_colors):
     else:
         return px.colors.sample_colorscale('Purples', n_colors)
 
+def weighted_box_stats(valores, pesos):
+    """
+    Calcula las estadísticas de un box plot ponderado por el factor de expansión.
+
+    Retorna q1, mediana, q3, media ponderada y bigotes (regla de 1.5·IQR) listos
+    para go.Box, sin replicar cada observación según su peso.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    pesos = np.asarray(pesos, dtype=np.float64)
+    
+    orden = np.argsort(valores)
+    valores, pesos = valores[orden], pesos[orden]
+    
+    # Cuantiles ponderados como inversa escalonada de la distribución acumulada:
+    # el primer valor cuyo peso acumulado alcanza la proporción pedida (lo mismo
+    # que daba replicar cada valor según su factor de expansión)
+    acumulado = np.cumsum(pesos) / pesos.sum()
+    indices = np.searchsorted(acumulado, [0.25, 0.5, 0.75], side='left')
+    q1, mediana, q3 = valores[np.minimum(indices, len(valores) - 1)]
+    media = np.average(valores, weights=pesos)
+    
+    iqr = q3 - q1
+    bigote_inferior = valores[np.searchsorted(valores, q1 - 1.5 * iqr, side='left')]
+    bigote_superior = valores[np.searchsorted(valores, q3 + 1.5 * iqr, side='right') - 1]
+    
+    return dict(q1=[q1], median=[mediana], q3=[q3], mean=[media],
+                lowerfence=[bigote_inferior], upperfence=[bigote_superior])
+
+def weighted_rate(df, by, activity_col, w='FACTOR DE EXPANSION'):
+    """
+    Porcentaje ponderado de respuestas 'SI' en activity_col para cada grupo de `by`,
+    con dos sumas agrupadas (en el orden de aparición de los grupos).
+    """
+    pesos = df[w].to_numpy(dtype=np.float64)
+    respuestas_si = df[activity_col].eq('SI').to_numpy(dtype=bool, na_value=False)
+    
+    yes_weight = pd.Series(respuestas_si * pesos, index=df.index).groupby(df[by], observed=True, sort=False).sum()
+    total_weight = df[w].groupby(df[by], observed=True, sort=False).sum()
+    return yes_weight / total_weight * 100
+
+def cortar_en_intervalos(valores, bordes, etiquetas):
+    """
+    Equivalente vectorizado de pd.cut(..., include_lowest=True).
+
+    Asigna cada valor al intervalo (bordes[i], bordes[i+1]] con un único
+    np.searchsorted. Los NaN y los valores fuera de rango quedan como faltantes.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    bordes = np.asarray(bordes, dtype=np.float64)
+    
+    codigos = np.searchsorted(bordes, valores, side='left') - 1
+    codigos[valores == bordes[0]] = 0
+    codigos[np.isnan(valores) | (codigos >= len(etiquetas))] = -1
+    
+    return pd.Categorical.from_codes(codigos, categories=etiquetas, ordered=True)
+
+# Nombres legibles de las variables culturales para la matriz de asociaciones. Cada regla
+# es (palabra del grupo, [(palabra, nombre)], nombre por defecto); se revisan en orden
+# sobre el nombre de la columna en minúsculas y gana la primera coincidencia
+REGLAS_NOMBRES_LEGIBLES = [
+    ('asistencia', [('biblioteca', 'Bibliotecas'), ('museo', 'Museos'), ('casa', 'Casas de Cultura'),
+                    ('centro', 'Centros Culturales'), ('exposicion', 'Exposiciones'),
+                    ('monumento', 'Monumentos'), ('curso', 'Cursos')],
+     lambda var: var.replace('ASISTENCIA ', '').replace('_', ' ').title()),
+    ('p3', [], lambda var: 'Teatro/Danza'),
+    ('p4', [], lambda var: 'Conciertos'),
+    ('p5', [], lambda var: 'Música en Bares'),
+    ('practica', [], lambda var: 'Práctica Cultural'),
+    ('lectura', [('libro', 'Lectura Libros'), ('revista', 'Lectura Revistas'),
+                 ('periodico', 'Lectura Periódicos')],
+     lambda var: f"Lectura ({var.split('_')[-1] if '_' in var else 'General'})"),
+]
+
+def nombre_legible(var):
+    """
+    Nombre legible de una variable cultural según REGLAS_NOMBRES_LEGIBLES.
+    """
+    var_min = var.lower()
+    for grupo, palabras, por_defecto in REGLAS_NOMBRES_LEGIBLES:
+        if grupo in var_min:
+            for palabra, nombre in palabras:
+                if palabra in var_min:
+                    return nombre
+            return por_defecto(var)
+    return var.replace('_', ' ').title()
+
+def huella_df(df):
+    """
+    Huella barata de un DataFrame para las cachés de Streamlit (forma y columnas).
+
+    Evita hashear todo el contenido en cada rerun; solo es válida para el
+    DataFrame compartido que entrega load_and_process_data.
+    """
+    return (df.shape, tuple(df.columns))
+
+def huella_contenido(df):
+    """
+    Huella del contenido de un DataFrame: forma, columnas y la suma de los hashes
+    por fila de pandas. Cambia si cambia cualquier valor, a costa de recorrer los datos.
+    """
+    return (df.shape, tuple(df.columns), int(pd.util.hash_pandas_object(df, index=False).sum()))
+
+# Subir esta versión cuando cambie la lógica de limpieza para invalidar la caché en disco
+VERSION_LIMPIEZA = 'v1'
+
+@st.cache_data(
+    persist='disk',
+    show_spinner=False,
+    hash_funcs={pd.DataFrame: lambda d: (VERSION_LIMPIEZA, huella_contenido(d))}
+)
 def limpiar_datos_categoricos(df, umbral_na=0.30):
     """
     Limpia un DataFrame eliminando variables con exceso de valores faltantes
@@ -112,10 +253,12 @@ def limpiar_datos_categoricos(df, umbral_na=0.30):
     Retorna:
     --------
     tuple: (DataFrame limpio, diccionario con información del proceso)
+
+    El resultado se guarda en disco (sobrevive a reinicios del servidor) y se
+    identifica por VERSION_LIMPIEZA y huella_contenido(df): un Excel nuevo o un
+    cambio en las derivaciones del cargador invalidan la entrada.
     """
     
-    df_limpio = df.copy()
-    
     info_limpieza = {
         'forma_original': df.shape,
         'columnas_eliminadas': [],
@@ -124,77 +267,91 @@ def limpiar_datos_categoricos(df, umbral_na=0.30):
     }
 
     # PASO 1: Identificar columnas con exceso de NAs
-    na_por_columna = df_limpio.isnull().sum()
-    porcentaje_na = (na_por_columna / len(df_limpio)) * 100
+    proporcion_na = pd.Series(df.isna().to_numpy().mean(axis=0), index=df.columns)
+    columnas_a_eliminar = proporcion_na.index[proporcion_na > umbral_na].tolist()
     
-    columnas_a_eliminar = porcentaje_na[porcentaje_na > (umbral_na * 100)].index.tolist()
+    # drop() devuelve un DataFrame nuevo sin copiar todo el original; las
+    # imputaciones de abajo reemplazan columnas en él sin tocar df
+    df_limpio = df.drop(columns=columnas_a_eliminar)
     
     if columnas_a_eliminar:
-        df_limpio = df_limpio.drop(columns=columnas_a_eliminar)
         info_limpieza['columnas_eliminadas'] = columnas_a_eliminar
         info_limpieza['observaciones'].append(f"Eliminadas {len(columnas_a_eliminar)} columnas con >{umbral_na*100}% de NAs")
 
     # PASO 2: Imputar variables categóricas
-    columnas_categoricas = df_limpio.select_dtypes(include=['object', 'category']).columns.tolist()
-    
-    for col in columnas_categoricas:
-        if df_limpio[col].isnull().sum() > 0:
-            if df_limpio[col].dtype.name == 'category':
-                if "NO INFORMACION" not in df_limpio[col].cat.categories:
-                    df_limpio[col] = df_limpio[col].cat.add_categories(["NO INFORMACION"])
-                df_limpio[col] = df_limpio[col].fillna("NO INFORMACION")
-            else:
-                df_limpio[col] = df_limpio[col].fillna("NO INFORMACION")
-            
-            info_limpieza['columnas_imputadas_categoricas'].append(col)
+    columnas_categoricas = df_limpio.select_dtypes(include=['object', 'string', 'category']).columns
+    tiene_na = df_limpio[columnas_categoricas].isna().any()
+    columnas_con_na = tiene_na.index[tiene_na].tolist()
+    
+    # Las categóricas necesitan la nueva categoría antes de poder imputarla
+    for col in columnas_con_na:
+        if df_limpio[col].dtype.name == 'category' and "NO INFORMACION" not in df_limpio[col].cat.categories:
+            df_limpio[col] = df_limpio[col].cat.add_categories(["NO INFORMACION"])
+    
+    if columnas_con_na:
+        df_limpio = df_limpio.fillna({col: "NO INFORMACION" for col in columnas_con_na})
+    
+    info_limpieza['columnas_imputadas_categoricas'] = columnas_con_na
 
     info_limpieza['forma_final'] = df_limpio.shape
     info_limpieza['observaciones'].append(f"Imputadas {len(info_limpieza['columnas_imputadas_categoricas'])} variables categóricas")
     
     return df_limpio, info_limpieza
 
+def metric_card(titulo, valor, nota=None):
+    """Devuelve el HTML de una tarjeta de métrica con el estilo metric-card."""
+    nota_html = f'<small>{nota}</small>' if nota else ''
+    return (f'<div class="metric-card"><div class="metric-label">{titulo}</div>'
+            f'<div class="metric-value">{valor}</div>{nota_html}</div>')
+
+def mostrar_tarjetas(tarjetas):
+    """Muestra una fila de tarjetas (titulo, valor[, nota]) con un solo st.markdown."""
+    html = ''.join(metric_card(*tarjeta) for tarjeta in tarjetas)
+    st.markdown(f'<div class="metric-row">{html}</div>', unsafe_allow_html=True)
+
+def lista_numerada(elementos):
+    """Arma una lista numerada en markdown para emitirla con un solo st.markdown."""
+    return "\n".join(f"{i}. {elemento}" for i, elemento in enumerate(elementos, 1))
+
 def mostrar_resultados_limpieza(info_limpieza):
     """Muestra los resultados del proceso de limpieza en Streamlit."""
     st.markdown("### 📊 Resultados de la Limpieza de Datos")
 
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("📋 Filas", f"{info_limpieza['forma_original'][0]:,} → {info_limpieza['forma_final'][0]:,}")
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    with col2:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("📊 Columnas", f"{info_limpieza['forma_original'][1]:,} → {info_limpieza['forma_final'][1]:,}")
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    with col3:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("🔧 Variables Imputadas", len(info_limpieza['columnas_imputadas_categoricas']))
-        st.markdown('</div>', unsafe_allow_html=True)
+    mostrar_tarjetas([
+        ("📋 Filas", f"{info_limpieza['forma_original'][0]:,} → {info_limpieza['forma_final'][0]:,}"),
+        ("📊 Columnas", f"{info_limpieza['forma_original'][1]:,} → {info_limpieza['forma_final'][1]:,}"),
+        ("🔧 Variables Imputadas", len(info_limpieza['columnas_imputadas_categoricas']))
+    ])
 
     if info_limpieza['columnas_eliminadas']:
         st.markdown('<div class="warning-box">', unsafe_allow_html=True)
-        st.markdown("**🗑️ Columnas Eliminadas:**")
-        for i, col in enumerate(info_limpieza['columnas_eliminadas'], 1):
-            st.write(f"{i}. {col}")
+        st.markdown("**🗑️ Columnas Eliminadas:**\n\n" + lista_numerada(info_limpieza['columnas_eliminadas']))
         st.markdown('</div>', unsafe_allow_html=True)
 
     if info_limpieza['columnas_imputadas_categoricas']:
         st.markdown('<div class="info-box">', unsafe_allow_html=True)
-        st.markdown("**🔤 Variables Categóricas Imputadas:**")
-        for i, col in enumerate(info_limpieza['columnas_imputadas_categoricas'], 1):
-            st.write(f"{i}. {col}")
+        st.markdown("**🔤 Variables Categóricas Imputadas:**\n\n" + lista_numerada(info_limpieza['columnas_imputadas_categoricas']))
         st.markdown('</div>', unsafe_allow_html=True)
 
     if info_limpieza['observaciones']:
         st.markdown('<div class="success-box">', unsafe_allow_html=True)
-        st.markdown("**📝 Resumen del Proceso:**")
-        for i, obs in enumerate(info_limpieza['observaciones'], 1):
-            st.write(f"{i}. {obs}")
+        st.markdown("**📝 Resumen del Proceso:**\n\n" + lista_numerada(info_limpieza['observaciones']))
         st.markdown('</div>', unsafe_allow_html=True)
 
+def _row_hash(df, cols):
+    """
+    Calcula un hash uint64 por fila sobre las columnas indicadas.
+
+    Sin caché propia: su único llamador, analizar_duplicados, ya está cacheado.
+    """
+    return pd.util.hash_pandas_object(df[list(cols)], index=False).to_numpy()
+
+def _contar_duplicados(hashes):
+    """Cuenta las filas repetidas (todas menos la primera aparición) a partir de sus hashes."""
+    _, conteos = np.unique(hashes, return_counts=True)
+    return int((conteos - 1).sum())
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: huella_df})
 def analizar_duplicados(df):
     """Realiza análisis de duplicados completos y parciales."""
     
@@ -206,7 +363,7 @@ def analizar_duplicados(df):
     }
     
     # Duplicados completos
-    duplicados_completos = df.duplicated().sum()
+    duplicados_completos = _contar_duplicados(_row_hash(df, tuple(df.columns)))
     info_duplicados['duplicados_completos'] = duplicados_completos
     
     if duplicados_completos > 0:
@@ -227,7 +384,7 @@ def analizar_duplicados(df):
     info_duplicados['variables_clave_encontradas'] = variables_clave_existentes
     
     if len(variables_clave_existentes) >= 2:
-        duplicados_parciales = df.duplicated(subset=variables_clave_existentes).sum()
+        duplicados_parciales = _contar_duplicados(_row_hash(df, tuple(variables_clave_existentes)))
         info_duplicados['duplicados_parciales'] = duplicados_parciales
         
         if duplicados_parciales > 0:
@@ -245,17 +402,194 @@ def analizar_duplicados(df):
     
     return info_duplicados
 
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: huella_df})
+def conteo_nulos(df):
+    """
+    Cuenta los valores nulos de cada columna.
+    """
+    return df.isnull().sum()
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: huella_df})
+def tabla_valores_faltantes(df):
+    """
+    Resume por variable los valores faltantes, su porcentaje, el tipo de dato
+    y los valores únicos, ordenado de mayor a menor porcentaje de NAs.
+    """
+    null_counts = conteo_nulos(df)
+    
+    return pd.DataFrame({
+        'Variable': df.columns,
+        'Valores_Faltantes': null_counts,
+        'Porcentaje_Faltante': null_counts * (100.0 / len(df)),
+        'Tipo_Dato': df.dtypes,
+        'Valores_Únicos': df.nunique()
+    }).sort_values('Porcentaje_Faltante', ascending=False)
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: huella_df})
+def frecuencias_categoricas(df, columna, max_categorias=30):
+    """
+    Frecuencias de una variable categórica para graficar: las max_categorias
+    más frecuentes, el resto agrupado en 'Otros' y los NaN como 'NaN/Faltante'.
+    """
+    # Sin NaN aquí: los faltantes se agregan una sola vez como 'NaN/Faltante'
+    value_counts = df[columna].value_counts()
+    
+    if len(value_counts) > max_categorias:
+        otros = value_counts.iloc[max_categorias:].sum()
+        value_counts = value_counts.head(max_categorias).copy()
+        value_counts.loc['Otros'] = otros
+    
+    # Incluir NaNs en el conteo si existen
+    n_faltantes = df[columna].isnull().sum()
+    if n_faltantes > 0:
+        value_counts.loc['NaN/Faltante'] = n_faltantes
+    return value_counts
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: huella_df})
+def resumen_actividad(df, activity_col):
+    """
+    Indicadores de la página de actividades para una actividad: tasa de participación,
+    total de participantes, grupo de edad más activo y las tablas por edad y por
+    nivel educativo, todo ponderado por FACTOR DE EXPANSION (que el cargador siempre crea).
+    """
+    respuestas_si = df[activity_col].eq('SI').to_numpy(dtype=bool, na_value=False)
+    pesos = df['FACTOR DE EXPANSION'].to_numpy(dtype=np.float64)
+
+    total_participants = pesos[respuestas_si].sum()
+    total_weight = pesos.sum()
+    participation_rate = (total_participants / total_weight * 100) if total_weight > 0 else 0
+
+    age_participation = weighted_rate(df, 'grupo_edad', activity_col)
+    edu_participation = weighted_rate(df, 'NIVEL EDUCATIVO', activity_col)
+    max_group = age_participation.idxmax()
+
+    return {
+        'participation_rate': participation_rate,
+        'total_participants': total_participants,
+        'max_group': max_group,
+        'age_participation_df': pd.DataFrame({
+            'grupo_edad': list(age_participation.index),
+            'participacion': age_participation.to_numpy()
+        }),
+        'edu_participation_df': pd.DataFrame({
+            'nivel_educativo': list(edu_participation.index),
+            'participacion': edu_participation.to_numpy()
+        }).sort_values('participacion', ascending=False)
+    }
+
+# Las figuras se construyen a partir de resúmenes pequeños y se cachean: en un rerun
+# con las mismas entradas Streamlit devuelve la figura sin volver a armarla
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: huella_df})
+def figura_participacion(df):
+    """
+    Gráfico de dona de la población por nivel de participación cultural.
+    """
+    participation_data = df.groupby('nivel_participacion', observed=True)['FACTOR DE EXPANSION'].sum().reset_index()
+    participation_data.columns = ['Nivel de Participación', 'Población']
+    participation_data['Porcentaje'] = participation_data['Población'] / participation_data['Población'].sum() * 100
+    
+    colors = get_purple_palette(len(participation_data))
+    
+    fig = px.pie(participation_data, 
+                 values='Población', 
+                 names='Nivel de Participación',
+                 color_discrete_sequence=colors,
+                 hole=0.4)
+    
+    fig.update_layout(
+        annotations=[dict(text=f'Total: {int(participation_data["Población"].sum()):,}', 
+                         x=0.5, y=0.5, font_size=12, showarrow=False)],
+        font=dict(size=12)
+    )
+    
+    # Agregar etiquetas con porcentajes
+    fig.update_traces(textposition='outside', textinfo='percent+label')
+    return fig
+
+@st.cache_data(show_spinner=False)
+def figura_top_actividades(actividades):
+    """
+    Barras horizontales con el porcentaje ponderado de cada actividad;
+    recibe una tupla de pares (actividad, proporción).
+    """
+    activities_df = pd.DataFrame(list(actividades), columns=['Actividad', 'Porcentaje'])
+    activities_df = activities_df.sort_values('Porcentaje', ascending=True)
+    activities_df['Porcentaje'] *= 100
+    
+    fig = px.bar(activities_df, x='Porcentaje', y='Actividad',
+                orientation='h',
+                color='Porcentaje',
+                color_continuous_scale='Purples',
+                text='Porcentaje')
+    
+    fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+    
+    fig.update_layout(
+        xaxis_title="Porcentaje de Participación (%)",
+        yaxis_title="",
+        font=dict(size=12),
+        height=500
+    )
+    return fig
+
+@st.cache_data(show_spinner=False)
+def figura_piramide(piramide):
+    """
+    Pirámide poblacional a partir de la tabla grupo de edad x género.
+    """
+    fig = go.Figure()
+    
+    if 'HOMBRE' in piramide.columns:
+        men_data = piramide['HOMBRE']
+        fig.add_trace(go.Bar(
+            y=men_data.index,
+            x=-men_data.values,
+            name='Hombres',
+            orientation='h',
+            marker_color='#6a0dad'
+        ))
+    
+    if 'MUJER' in piramide.columns:
+        women_data = piramide['MUJER']
+        fig.add_trace(go.Bar(
+            y=women_data.index,
+            x=women_data.values,
+            name='Mujeres',
+            orientation='h',
+            marker_color='#ba55d3'
+        ))
+    
+    fig.update_layout(
+        barmode='relative',
+        bargap=0.1,
+        xaxis_title="Población (Factor de Expansión)",
+        yaxis_title="Grupo de Edad",
+        font=dict(size=12)
+    )
+    return fig
+
+@st.cache_data(show_spinner=False)
+def figura_educacion(education_counts):
+    """
+    Gráfico de dona de la población por nivel educativo.
+    """
+    colors = get_purple_palette(len(education_counts))
+    
+    fig = px.pie(values=education_counts.values,
+        names=education_counts.index,
+        color_discrete_sequence=colors,
+        hole=0.4)
+    
+    fig.update_layout(
+        title="Distribución ponderada por Factor de Expansión"
+    )
+    return fig
+
 # =============================================================================
-# HEADER PRINCIPAL Y NAVEGACIÓN
+# NAVEGACIÓN
 # =============================================================================
 
-st.markdown("""
-<div class="main-header">
-    <h1>🎭 Dashboard de Análisis Cultural</h1>
-    <p>Análisis Estadístico de Participación Cultural en Colombia</p>
-</div>
-""", unsafe_allow_html=True)
-
 # Sidebar para navegación
 st.sidebar.markdown("## 🎨 Panel de Control")
 page = st.sidebar.selectbox(
@@ -276,78 +610,130 @@ st.sidebar.markdown("""
 # FUNCIÓN PRINCIPAL DE CARGA Y PROCESAMIENTO DE DATOS
 # =============================================================================
 
-@st.cache_data
+def leer_datos_crudos(ruta_excel=ARCHIVO_DATOS, ruta_parquet=ARCHIVO_PARQUET):
+    """
+    Lee los datos crudos usando una copia Parquet del Excel como caché en disco.
+
+    El Excel solo se parsea la primera vez o cuando es más reciente que la
+    copia Parquet; el resto de las veces se lee con pyarrow.
+    """
+    if os.path.exists(ruta_parquet) and os.path.getmtime(ruta_parquet) >= os.path.getmtime(ruta_excel):
+        try:
+            return pd.read_parquet(ruta_parquet, engine='pyarrow', dtype_backend='pyarrow')
+        except Exception as e:
+            # Copia dañada o ilegible: se vuelve a leer el Excel y se reescribe la copia
+            st.warning(f"⚠️ No se pudo leer la copia Parquet de los datos, se usará el Excel: {str(e)}")
+
+    try:
+        # python-calamine parsea el Excel varias veces más rápido que openpyxl
+        df = pd.read_excel(ruta_excel, engine='calamine', dtype_backend='pyarrow')
+    except (ImportError, ValueError):
+        df = pd.read_excel(ruta_excel, engine='openpyxl', dtype_backend='pyarrow')
+    
+    # Se escribe en un temporal del mismo directorio y se reemplaza de forma atómica,
+    # para que una escritura interrumpida nunca deje una copia truncada más reciente que el Excel
+    ruta_temporal = f"{ruta_parquet}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(ruta_temporal, engine='pyarrow', compression='snappy', index=False)
+        os.replace(ruta_temporal, ruta_parquet)
+    except Exception as e:
+        st.warning(f"⚠️ No se pudo guardar la copia Parquet de los datos: {str(e)}")
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+    return df
+
+# Columnas de texto que se convierten a 'category' al cargar los datos
+COLUMNAS_CATEGORICAS = [
+    'SEXO', 'NIVEL EDUCATIVO', 'ETNIA', 'LECTURA LIBROS', 'PRACTICA CULTURAL',
+    'ASISTENCIA BIBLIOTECA', 'P3', 'P4', 'P5', 'ASISTENCIA MONUMENTOS', 'ASISTENCIA CENTROS CUTURALES',
+    'ASISTENCIA CASAS DE CULTURA', 'ASISTENCIA CURSOS', 'ASISTENCIA MUSEOS'
+]
+
+@st.cache_resource(show_spinner=False)
 def load_and_process_data():
-    """Carga y procesa los datos culturales desde el archivo Excel."""
+    """
+    Carga y procesa los datos culturales desde el archivo Excel.
+
+    El DataFrame retornado se comparte entre reruns y sesiones sin copiarse
+    (st.cache_resource): no debe modificarse; usar .copy() donde se necesite mutar.
+    """
     try:
-        st.info("📂 Cargando datos desde cultura.xlsx...")
-        data = pd.read_excel('cultura.xlsx')
-        df = pd.DataFrame(data)
+        st.info(f"📂 Cargando datos desde {ARCHIVO_DATOS}...")
+        df = leer_datos_crudos()
         
         # Validar factor de expansión
         if 'FACTOR DE EXPANSION' in df.columns:
-            df['FACTOR DE EXPANSION'] = pd.to_numeric(df['FACTOR DE EXPANSION'], errors='coerce')
-            valores_nulos = df['FACTOR DE EXPANSION'].isnull().sum()
+            factor = pd.to_numeric(df['FACTOR DE EXPANSION'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            no_validos = ~np.isfinite(factor)
+            no_positivos = factor <= 0
             
+            valores_nulos = np.count_nonzero(no_validos)
             if valores_nulos > 0:
                 st.warning(f"⚠️ {valores_nulos} valores no válidos en FACTOR DE EXPANSION reemplazados con 1")
-                df['FACTOR DE EXPANSION'].fillna(1, inplace=True)
                 
-            valores_invalidos = (df['FACTOR DE EXPANSION'] <= 0).sum()
+            valores_invalidos = np.count_nonzero(no_positivos)
             if valores_invalidos > 0:
                 st.warning(f"⚠️ {valores_invalidos} valores ≤0 reemplazados con 1")
-                df.loc[df['FACTOR DE EXPANSION'] <= 0, 'FACTOR DE EXPANSION'] = 1
+            
+            df['FACTOR DE EXPANSION'] = np.where(no_validos | no_positivos, 1.0, factor)
         else:
             st.warning("⚠️ No se encontró FACTOR DE EXPANSION. Se asume valor 1.")
             df['FACTOR DE EXPANSION'] = 1
         
         # Crear grupos de edad
         if 'EDAD' in df.columns:
-            df['EDAD'] = pd.to_numeric(df['EDAD'], errors='coerce')
-            df['grupo_edad'] = pd.cut(
-                df['EDAD'], 
-                bins=[0, 12, 18, 28, 40, 60, 100],
-                labels=["Niñez (0-12)", "Adolescencia (13-18)", "Juventud (19-28)", 
-                       "Adultez temprana (29-40)", "Adultez media (41-60)", "Adulto mayor (60+)"],
-                include_lowest=True
+            # Edades enteras no negativas caben en uint8; si no, se deja el tipo original
+            edad = pd.to_numeric(df['EDAD'], errors='coerce', downcast='unsigned')
+            df['EDAD'] = edad
+            edad = edad.to_numpy(dtype=np.float64, na_value=np.nan)
+            
+            # Intervalos (0,12], (12,18], ..., (60,100]: con la edad redondeada hacia
+            # arriba a int16 bastan comparaciones enteras contra los bordes inferiores
+            fuera_de_rango = np.isnan(edad) | (edad < 0) | (edad > 100)
+            edad_entera = np.ceil(np.where(fuera_de_rango, 0, edad)).astype(np.int16)
+            codigos_edad = np.digitize(edad_entera, np.array([13, 19, 29, 41, 61], dtype=np.int16)).astype(np.int8)
+            codigos_edad[fuera_de_rango] = -1
+            
+            df['grupo_edad'] = pd.Categorical.from_codes(
+                codigos_edad,
+                categories=["Niñez (0-12)", "Adolescencia (13-18)", "Juventud (19-28)", 
+                           "Adultez temprana (29-40)", "Adultez media (41-60)", "Adulto mayor (60+)"],
+                ordered=True
             )
         
-        # Crear grupos de ingreso
+        # Crear grupos de ingreso (cuartiles; si hay cuartiles repetidos el
+        # intervalo correspondiente simplemente queda vacío)
         if 'P2' in df.columns:
-            df['P2'] = pd.to_numeric(df['P2'], errors='coerce')
+            p2 = pd.to_numeric(df['P2'], errors='coerce')
+            df['P2'] = p2
+            p2 = p2.to_numpy(dtype=np.float64, na_value=np.nan)
             
-            if not df['P2'].isna().all():
-                valid_incomes = df['P2'].dropna()
-                
-                if len(valid_incomes) > 10:
-                    try:
-                        df['grupo_ingreso'] = pd.qcut(
-                            df['P2'], q=4, 
-                            labels=['Bajo', 'Medio-Bajo', 'Medio-Alto', 'Alto'], 
-                            duplicates='drop'
-                        )
-                    except ValueError:
-                        percentiles = np.percentile(valid_incomes, [25, 50, 75])
-                        df['grupo_ingreso'] = pd.cut(
-                            df['P2'],
-                            bins=[-np.inf] + list(percentiles) + [np.inf],
-                            labels=['Bajo', 'Medio-Bajo', 'Medio-Alto', 'Alto'],
-                            include_lowest=True
-                        )
+            if np.count_nonzero(~np.isnan(p2)) > 10:
+                cuartiles = np.nanquantile(p2, [0.25, 0.5, 0.75])
+                df['grupo_ingreso'] = cortar_en_intervalos(
+                    p2,
+                    bordes=[-np.inf, *cuartiles, np.inf],
+                    etiquetas=['Bajo', 'Medio-Bajo', 'Medio-Alto', 'Alto']
+                )
         
         # Convertir variables SI/NO a numéricas
+        # (se normalizan solo las categorías, no cada fila; los NaN tienen código -1)
         variables_convertidas = []
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                unique_vals = set(df[col].dropna().astype(str).str.strip().str.upper().unique())
-                
-                if unique_vals.issubset({'SI', 'NO', 'SÍ'}):
-                    col_num = f'{col.lower().replace(" ", "_")}_num'
-                    df[col_num] = df[col].astype(str).str.strip().str.upper().map({
-                        'SI': 1, 'SÍ': 1, 'NO': 0
-                    })
-                    df[col_num] = df[col_num].fillna(0).astype(int)
-                    variables_convertidas.append((col, col_num))
+        for col in df.select_dtypes(include=['object', 'string']).columns:
+            # Descarte rápido: si en las primeras filas ya aparece otro valor, no es SI/NO
+            muestra = pd.Index(df[col].head(1000).dropna().unique()).astype(str).str.strip().str.upper()
+            if not set(muestra).issubset({'SI', 'NO', 'SÍ'}):
+                continue
+            
+            cat = df[col].astype('category')
+            categorias = cat.cat.categories.astype(str).str.strip().str.upper()
+            
+            if set(categorias).issubset({'SI', 'NO', 'SÍ'}):
+                col_num = f'{col.lower().replace(" ", "_")}_num'
+                # El último elemento (0) corresponde al código -1 de los NaN
+                tabla = np.append(categorias.isin(['SI', 'SÍ']), False).astype(np.int8)
+                df[col_num] = np.take(tabla, cat.cat.codes.to_numpy())
+                variables_convertidas.append((col, col_num))
         
         if variables_convertidas:
             st.success(f"✅ Convertidas {len(variables_convertidas)} variables SI/NO")
@@ -370,25 +756,43 @@ def load_and_process_data():
                         cultural_vars_numeric.append(var_num)
         
         if cultural_vars_numeric:
+            # Normalmente son códigos enteros pequeños (0/1 o 1/2) y se guardan como int8;
+            # solo se reduce el tipo si todos los valores caben, para que códigos como
+            # 999 ("no responde") no se desborden y se sumen igual que antes
             for col in cultural_vars_numeric:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+                valores = pd.to_numeric(df[col], errors='coerce').fillna(0)
+                if valores.between(-128, 127).all() and valores.eq(valores.round()).all():
+                    valores = valores.astype(np.int8)
+                df[col] = valores
             
-            df['indice_cultural'] = df[cultural_vars_numeric].sum(axis=1, skipna=True)
+            # La suma por fila se hace sobre una matriz contigua de NumPy
+            todos_int8 = all(df[col].dtype == np.int8 for col in cultural_vars_numeric)
+            matriz_cultural = np.ascontiguousarray(
+                df[cultural_vars_numeric].to_numpy(dtype=np.int8 if todos_int8 else np.float64)
+            )
+            indice = matriz_cultural.sum(axis=1, dtype=np.int16 if todos_int8 else np.float64)
+            df['indice_cultural'] = indice
             
+            # El nivel se deriva del mismo arreglo del índice, sin volver a pasar por pandas
             max_possible = len(cultural_vars_numeric)
             if max_possible >= 3:
                 tercio_1 = max_possible / 3
                 tercio_2 = 2 * max_possible / 3
                 
-                df['nivel_participacion'] = pd.cut(
-                    df['indice_cultural'],
-                    bins=[-0.1, tercio_1, tercio_2, max_possible],
-                    labels=['Bajo', 'Medio', 'Alto'],
-                    include_lowest=True
+                df['nivel_participacion'] = cortar_en_intervalos(
+                    indice,
+                    bordes=[-0.1, tercio_1, tercio_2, max_possible],
+                    etiquetas=['Bajo', 'Medio', 'Alto']
                 )
             else:
-                df['nivel_participacion'] = df['indice_cultural'].apply(
-                    lambda x: 'Alto' if x >= max_possible * 0.7 else ('Medio' if x >= max_possible * 0.3 else 'Bajo')
+                df['nivel_participacion'] = pd.Categorical(
+                    np.select(
+                        [indice >= max_possible * 0.7, indice >= max_possible * 0.3],
+                        ['Alto', 'Medio'],
+                        default='Bajo'
+                    ),
+                    categories=['Bajo', 'Medio', 'Alto'],
+                    ordered=True
                 )
             
             st.success(f"✅ Índice cultural creado con {len(cultural_vars_numeric)} variables")
@@ -405,24 +809,38 @@ def load_and_process_data():
             df['poblacion_representada'] = 1
             st.error(f"Error calculando población representada: {str(e)}")
         
+        # Columnas de texto usadas como claves de agrupación y filtros: como
+        # 'category' se guardan códigos enteros y una tabla pequeña de niveles
+        for col in COLUMNAS_CATEGORICAS:
+            if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = df[col].astype('category')
+        
+        # Lista de columnas categóricas calculada una sola vez para todas las páginas
+        df.attrs['cat_cols'] = df.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
+        
         return df
         
+    # st.stop() en lugar de retornar un DataFrame vacío: la excepción evita que
+    # st.cache_resource guarde la carga fallida para todas las sesiones
     except FileNotFoundError:
         st.error("❌ No se encontró el archivo 'cultura.xlsx'")
-        return pd.DataFrame()
+        st.stop()
     except Exception as e:
         st.error(f"❌ Error al cargar los datos: {str(e)}")
-        return pd.DataFrame()
+        st.stop()
 
 # =============================================================================
 # CARGAR DATOS PRINCIPALES
 # =============================================================================
 
+# Si la carga falla, load_and_process_data muestra el error y detiene el script
 df = load_and_process_data()
 
-if df.empty:
-    st.error("❌ No se pudieron cargar los datos. Verifica el archivo 'cultura.xlsx'.")
-    st.stop()
+# Huella del contenido del DataFrame compartido, verificada al final del script en modo debug
+huella_inicial = huella_contenido(df) if MODO_DEBUG else None
+
+# Nulos por columna del DataFrame completo (cacheado), para verificaciones sin recorrer columnas
+nulos = conteo_nulos(df)
 
 # =============================================================================
 # PÁGINA: LIMPIEZA Y DESCRIPTIVAS
@@ -431,36 +849,26 @@ if df.empty:
 if page == "🧹 Limpieza y Descriptivas":
     st.markdown('<div class="section-header"><h2>🧹 Limpieza y Estadísticas Descriptivas</h2></div>', unsafe_allow_html=True)
     
+    # Resumen de NAs por columna (cacheado): se reutiliza en toda la página
+    missing_data = tabla_valores_faltantes(df)
+    total_missing = int(missing_data['Valores_Faltantes'].sum())
+    n_rows = len(df)
+    
     # Información básica del dataset
     st.markdown('<div class="plot-container">', unsafe_allow_html=True)
     st.subheader("📋 Información General del Dataset")
     
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("📊 Total de Registros", f"{len(df):,}")
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("📋 Total de Variables", f"{len(df.columns)}")
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        total_missing = df.isnull().sum().sum()
-        st.metric("❌ Total de NAs", f"{total_missing:,}")
-        st.markdown('</div>', unsafe_allow_html=True)
+    try:
+        poblacion_representada = f"{df['FACTOR DE EXPANSION'].sum():,.0f}"
+    except:
+        poblacion_representada = "N/A"
     
-    with col4:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        try:
-            poblacion_total = df['FACTOR DE EXPANSION'].sum()
-            st.metric("👥 Población Representada", f"{poblacion_total:,.0f}")
-        except:
-            st.metric("👥 Población Representada", "N/A")
-        st.markdown('</div>', unsafe_allow_html=True)
+    mostrar_tarjetas([
+        ("📊 Total de Registros", f"{len(df):,}"),
+        ("📋 Total de Variables", f"{len(df.columns)}"),
+        ("❌ Total de NAs", f"{total_missing:,}"),
+        ("👥 Población Representada", poblacion_representada),
+    ])
     
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -489,7 +897,7 @@ if page == "🧹 Limpieza y Descriptivas":
         )
     
     with col2:
-        total_nas_actual = df.isnull().sum().sum()
+        total_nas_actual = total_missing
         if total_nas_actual == 0:
             st.markdown("""
             <div class="success-box">
@@ -498,7 +906,7 @@ if page == "🧹 Limpieza y Descriptivas":
             </div>
             """, unsafe_allow_html=True)
         else:
-            porcentaje_nas = (total_nas_actual / (len(df) * len(df.columns))) * 100
+            porcentaje_nas = (total_nas_actual / (n_rows * len(df.columns))) * 100
             st.markdown(f"""
             <div class="warning-box">
             <h4>⚠️ Datos requieren limpieza</h4>
@@ -518,14 +926,6 @@ if page == "🧹 Limpieza y Descriptivas":
     st.markdown('<div class="plot-container">', unsafe_allow_html=True)
     st.subheader("🔥 Análisis de Valores Faltantes")
     
-    missing_data = pd.DataFrame({
-        'Variable': df.columns,
-        'Valores_Faltantes': df.isnull().sum(),
-        'Porcentaje_Faltante': (df.isnull().sum() / len(df)) * 100,
-        'Tipo_Dato': df.dtypes,
-        'Valores_Únicos': [df[col].nunique() for col in df.columns]
-    }).sort_values('Porcentaje_Faltante', ascending=False)
-    
     missing_data_filtered = missing_data[missing_data['Porcentaje_Faltante'] > 0]
     
     if not missing_data_filtered.empty:
@@ -605,50 +1005,23 @@ if page == "🧹 Limpieza y Descriptivas":
     
     info_duplicados = analizar_duplicados(df)
     
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("🔴 Duplicados Completos", info_duplicados['duplicados_completos'])
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("🟡 Duplicados Parciales", info_duplicados['duplicados_parciales'])
-        st.markdown('</div>', unsafe_allow_html=True)
+    mostrar_tarjetas([
+        ("🔴 Duplicados Completos", info_duplicados['duplicados_completos']),
+        ("🟡 Duplicados Parciales", info_duplicados['duplicados_parciales']),
+        ("🔑 Variables Clave", len(info_duplicados['variables_clave_encontradas'])),
+    ])
     
-    with col3:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("🔑 Variables Clave", len(info_duplicados['variables_clave_encontradas']))
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Mostrar recomendaciones
-    st.markdown("### 💡 Recomendaciones")
+    # Mostrar recomendaciones (todas las cajas en un solo st.markdown)
+    cajas = []
     for recomendacion in info_duplicados['recomendaciones']:
-        if "CRÍTICO" in recomendacion:
-            st.markdown(f"""
-            <div class="warning-box">
-            {recomendacion}
-            </div>
-            """, unsafe_allow_html=True)
-        elif "ATENCIÓN" in recomendacion:
-            st.markdown(f"""
-            <div class="warning-box">
-            {recomendacion}
-            </div>
-            """, unsafe_allow_html=True)
+        if "CRÍTICO" in recomendacion or "ATENCIÓN" in recomendacion:
+            clase = "warning-box"
         elif "✅" in recomendacion:
-            st.markdown(f"""
-            <div class="success-box">
-            {recomendacion}
-            </div>
-            """, unsafe_allow_html=True)
+            clase = "success-box"
         else:
-            st.markdown(f"""
-            <div class="info-box">
-            {recomendacion}
-            </div>
-            """, unsafe_allow_html=True)
+            clase = "info-box"
+        cajas.append(f'<div class="{clase}">{recomendacion}</div>')
+    st.markdown("### 💡 Recomendaciones\n\n" + "".join(cajas), unsafe_allow_html=True)
     
     # Botón para eliminar duplicados completos si existen
     if info_duplicados['duplicados_completos'] > 0:
@@ -685,7 +1058,7 @@ if page == "🧹 Limpieza y Descriptivas":
     st.subheader("🏷️ Análisis de Variables Categóricas")
     
     # Identificar variables categóricas (tipo object)
-    categorical_vars = df.select_dtypes(include=['object', 'category']).columns.tolist()
+    categorical_vars = df.attrs['cat_cols']
     
     if categorical_vars:
         selected_cat_var = st.selectbox("Selecciona una variable categórica para analizar:", categorical_vars)
@@ -693,12 +1066,8 @@ if page == "🧹 Limpieza y Descriptivas":
         col1, col2 = st.columns(2)
         
         with col1:
-            # Frecuencias de la variable seleccionada
-            value_counts = df[selected_cat_var].value_counts(dropna=False)
-            
-            # Incluir NaNs en el conteo si existen
-            if df[selected_cat_var].isnull().sum() > 0:
-                value_counts.loc['NaN/Faltante'] = df[selected_cat_var].isnull().sum()
+            # Frecuencias de la variable seleccionada (cacheadas, máximo 30 barras)
+            value_counts = frecuencias_categoricas(df, selected_cat_var)
             
             fig = px.bar(x=value_counts.index, 
                         y=value_counts.values,
@@ -737,36 +1106,45 @@ if page == "🧹 Limpieza y Descriptivas":
 elif page == "📊 Resumen Ejecutivo":
     st.markdown('<div class="section-header"><h2>📊 Resumen Ejecutivo</h2></div>', unsafe_allow_html=True)
     
-    # Métricas principales con factor de expansión
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        poblacion_total = int(df['FACTOR DE EXPANSION'].sum())
-        st.metric("Población Representada", f"{poblacion_total:,}")
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col2:
-        # Porcentaje de participación usando factor de expansión
-        participation_high = ((df['indice_cultural'] > 3) * df['FACTOR DE EXPANSION']).sum() / df['FACTOR DE EXPANSION'].sum() * 100
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Participación Cultural", f"{participation_high:.1f}%")
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col3:
-        # Edad promedio ponderada
-        avg_age = (df['EDAD'] * df['FACTOR DE EXPANSION']).sum() / df['FACTOR DE EXPANSION'].sum()
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Edad Promedio", f"{avg_age:.1f} años")
-        st.markdown('</div>', unsafe_allow_html=True)
+    # Factor de expansión como arreglo numpy, extraído una sola vez para toda la página
+    fe = df['FACTOR DE EXPANSION'].to_numpy(dtype=float)
+    fe_total = fe.sum()
+    
+    # Porcentaje ponderado de respuestas 'SI' entre las respuestas válidas (SI/NO)
+    def weighted_percentage(column, value='SI'):
+        valores = df[column]
+        if isinstance(valores.dtype, pd.CategoricalDtype):
+            # Se compara una vez por categoría y se indexa con los códigos;
+            # el último elemento (False) corresponde al código -1 de los NaN
+            categorias = valores.cat.categories
+            codigos = valores.cat.codes.to_numpy()
+            es_valor = np.take(np.append(categorias == value, False), codigos)
+            validos = np.take(np.append(categorias.isin(['SI', 'NO']), False), codigos)
+        else:
+            es_valor = valores.eq(value).to_numpy(dtype=bool, na_value=False)
+            validos = valores.isin(['SI', 'NO']).to_numpy(dtype=bool)
+        peso_validos = fe[validos].sum()
+        if peso_validos == 0:
+            return 0
+        return es_valor[validos] @ fe[validos] / peso_validos
     
-    with col4:
-        # Porcentaje de lectura usando factor de expansión
-        df_reading = df[df['LECTURA LIBROS'].isin(['SI', 'NO'])].copy()
-        reading_rate = ((df_reading['LECTURA LIBROS'] == 'SI') * df_reading['FACTOR DE EXPANSION']).sum() / df_reading['FACTOR DE EXPANSION'].sum() * 100
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Hábito de Lectura", f"{reading_rate:.1f}%")
-        st.markdown('</div>', unsafe_allow_html=True)
+    # Métricas principales con factor de expansión
+    poblacion_total = int(fe_total)
+    # Porcentaje de participación usando factor de expansión
+    participation_high = (df['indice_cultural'].to_numpy() > 3) @ fe / fe_total * 100
+    # Edad promedio ponderada (solo sobre las personas con edad registrada)
+    edad = df['EDAD'].to_numpy(dtype=float, na_value=np.nan)
+    con_edad = ~np.isnan(edad)
+    avg_age = np.average(edad[con_edad], weights=fe[con_edad]) if con_edad.any() else 0
+    # Porcentaje de lectura usando factor de expansión
+    reading_rate = weighted_percentage('LECTURA LIBROS') * 100
+    
+    mostrar_tarjetas([
+        ("Población Representada", f"{poblacion_total:,}"),
+        ("Participación Cultural", f"{participation_high:.1f}%"),
+        ("Edad Promedio", f"{avg_age:.1f} años"),
+        ("Hábito de Lectura", f"{reading_rate:.1f}%"),
+    ])
     
     # Gráficos principales
     col1, col2 = st.columns(2)
@@ -775,27 +1153,8 @@ elif page == "📊 Resumen Ejecutivo":
         st.markdown('<div class="plot-container">', unsafe_allow_html=True)
         st.subheader("🎭 Distribución por Nivel de Participación Cultural")
         
-        # Calcular distribución con factor de expansión
-        participation_data = df.groupby('nivel_participacion')['FACTOR DE EXPANSION'].sum().reset_index()
-        participation_data.columns = ['Nivel de Participación', 'Población']
-        participation_data['Porcentaje'] = participation_data['Población'] / participation_data['Población'].sum() * 100
-        
-        colors = get_purple_palette(len(participation_data))
-        
-        fig = px.pie(participation_data, 
-                     values='Población', 
-                     names='Nivel de Participación',
-                     color_discrete_sequence=colors,
-                     hole=0.4)
-        
-        fig.update_layout(
-            annotations=[dict(text=f'Total: {int(participation_data["Población"].sum()):,}', 
-                             x=0.5, y=0.5, font_size=12, showarrow=False)],
-            font=dict(size=12)
-        )
-        
-        # Agregar etiquetas con porcentajes
-        fig.update_traces(textposition='outside', textinfo='percent+label')
+        # Distribución con factor de expansión (figura cacheada)
+        fig = figura_participacion(df)
         
         st.plotly_chart(fig, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
@@ -804,9 +1163,9 @@ elif page == "📊 Resumen Ejecutivo":
         st.markdown('<div class="plot-container">', unsafe_allow_html=True)
         st.subheader("👥 Distribución por Género y Edad")
         # Asegurarse de que hay datos válidos para el gráfico
-        if not df['grupo_edad'].isna().all() and not df['SEXO'].isna().all():
+        if nulos['grupo_edad'] < len(df) and nulos['SEXO'] < len(df):
             # Agrupar por género y grupo de edad, aplicando el factor de expansión
-            gender_age_data = df.groupby(['grupo_edad', 'SEXO'])['FACTOR DE EXPANSION'].sum().reset_index()
+            gender_age_data = df.groupby(['grupo_edad', 'SEXO'], observed=True)['FACTOR DE EXPANSION'].sum().reset_index()
             gender_age_data.columns = ['Grupo de Edad', 'Género', 'Población']
             
             fig = px.bar(gender_age_data, 
@@ -832,44 +1191,20 @@ elif page == "📊 Resumen Ejecutivo":
     st.markdown('<div class="plot-container">', unsafe_allow_html=True)
     st.subheader("🏆 Top 10 Actividades Culturales Más Populares")
     
-    # Función para calcular el porcentaje ponderado con factor de expansión
-    def weighted_percentage(df, column, value='SI'):
-        df_valid = df[df[column].isin(['SI', 'NO'])].copy()
-        if df_valid.empty:
-            return 0
-        return ((df_valid[column] == value) * df_valid['FACTOR DE EXPANSION']).sum() / df_valid['FACTOR DE EXPANSION'].sum()
-    
     activities = {
-        'Lectura de Libros': weighted_percentage(df, 'LECTURA LIBROS'),
-        'Práctica Cultural': weighted_percentage(df, 'PRACTICA CULTURAL'),
-        'Asistencia a Bibliotecas': weighted_percentage(df, 'ASISTENCIA BIBLIOTECA'),
-        'Conciertos/Música en Vivo': weighted_percentage(df, 'P4'),
-        'Monumentos Históricos': weighted_percentage(df, 'ASISTENCIA MONUMENTOS'),
-        'Teatro/Ópera/Danza': weighted_percentage(df, 'P3'),
-        'Centros Culturales': weighted_percentage(df, 'ASISTENCIA CENTROS CUTURALES'),
-        'Casas de Cultura': weighted_percentage(df, 'ASISTENCIA CASAS DE CULTURA'),
-        'Cursos/Talleres': weighted_percentage(df, 'ASISTENCIA CURSOS'),
-        'Museos': weighted_percentage(df, 'ASISTENCIA MUSEOS')
+        'Lectura de Libros': weighted_percentage('LECTURA LIBROS'),
+        'Práctica Cultural': weighted_percentage('PRACTICA CULTURAL'),
+        'Asistencia a Bibliotecas': weighted_percentage('ASISTENCIA BIBLIOTECA'),
+        'Conciertos/Música en Vivo': weighted_percentage('P4'),
+        'Monumentos Históricos': weighted_percentage('ASISTENCIA MONUMENTOS'),
+        'Teatro/Ópera/Danza': weighted_percentage('P3'),
+        'Centros Culturales': weighted_percentage('ASISTENCIA CENTROS CUTURALES'),
+        'Casas de Cultura': weighted_percentage('ASISTENCIA CASAS DE CULTURA'),
+        'Cursos/Talleres': weighted_percentage('ASISTENCIA CURSOS'),
+        'Museos': weighted_percentage('ASISTENCIA MUSEOS')
     }
     
-    activities_df = pd.DataFrame(list(activities.items()), columns=['Actividad', 'Porcentaje'])
-    activities_df = activities_df.sort_values('Porcentaje', ascending=True)
-    activities_df['Porcentaje'] *= 100
-    
-    fig = px.bar(activities_df, x='Porcentaje', y='Actividad',
-                orientation='h',
-                color='Porcentaje',
-                color_continuous_scale='Purples',
-                text='Porcentaje')
-    
-    fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-    
-    fig.update_layout(
-        xaxis_title="Porcentaje de Participación (%)",
-        yaxis_title="",
-        font=dict(size=12),
-        height=500
-    )
+    fig = figura_top_actividades(tuple(activities.items()))
     st.plotly_chart(fig, use_container_width=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -892,14 +1227,25 @@ elif page == "🔍 Análisis Demográfico":
         ethnicity_options = ['Todos'] + sorted(df['ETNIA'].dropna().unique().tolist())
         selected_ethnicity = st.selectbox("Filtrar por Etnia:", options=ethnicity_options)
     
-    # Aplicar filtros
-    filtered_df = df.copy()
+    # Aplicar filtros: se acumula una sola máscara y se selecciona una vez
+    # (filtered_df solo se lee, así que no se copia el DataFrame compartido)
+    mascara = np.ones(len(df), dtype=bool)
     if selected_gender != 'Todos':
-        filtered_df = filtered_df[filtered_df['SEXO'] == selected_gender]
+        mascara &= df['SEXO'].eq(selected_gender).to_numpy(dtype=bool, na_value=False)
     if selected_education != 'Todos':
-        filtered_df = filtered_df[filtered_df['NIVEL EDUCATIVO'] == selected_education]
+        mascara &= df['NIVEL EDUCATIVO'].eq(selected_education).to_numpy(dtype=bool, na_value=False)
     if selected_ethnicity != 'Todos':
-        filtered_df = filtered_df[filtered_df['ETNIA'] == selected_ethnicity]
+        mascara &= df['ETNIA'].eq(selected_ethnicity).to_numpy(dtype=bool, na_value=False)
+    filtered_df = df if mascara.all() else df.loc[mascara]
+    
+    # Si la columna no tiene nulos o está vacía en el DataFrame completo, el
+    # resultado no depende de los filtros y no hace falta recorrerla
+    def sin_datos(col):
+        if nulos[col] == len(df):
+            return True
+        if nulos[col] == 0:
+            return filtered_df.empty
+        return filtered_df[col].isna().all()
     
     # Pirámide poblacional con FACTOR DE EXPANSION
     col1, col2 = st.columns(2)
@@ -908,50 +1254,16 @@ elif page == "🔍 Análisis Demográfico":
         st.markdown('<div class="plot-container">', unsafe_allow_html=True)
         st.subheader("👥 Pirámide Poblacional")
         
-        # Verificar datos para la pirámide
-        has_men = 'HOMBRE' in filtered_df['SEXO'].values and not filtered_df[filtered_df['SEXO'] == 'HOMBRE']['grupo_edad'].isna().all()
-        has_women = 'MUJER' in filtered_df['SEXO'].values and not filtered_df[filtered_df['SEXO'] == 'MUJER']['grupo_edad'].isna().all()
+        # Población por grupo de edad y género en una sola tabla cruzada con FACTOR DE EXPANSION;
+        # como los factores son positivos, los géneros sin ningún grupo de edad válido suman 0
+        piramide = pd.crosstab(filtered_df['grupo_edad'], filtered_df['SEXO'],
+                               values=filtered_df['FACTOR DE EXPANSION'], aggfunc='sum')
+        piramide = piramide.loc[:, piramide.sum() > 0]
+        has_men = 'HOMBRE' in piramide.columns
+        has_women = 'MUJER' in piramide.columns
         
         if has_men or has_women:
-            # Crear datos para pirámide utilizando FACTOR DE EXPANSION
-            if has_men:
-                men_data = filtered_df[filtered_df['SEXO'] == 'HOMBRE'].groupby('grupo_edad')['FACTOR DE EXPANSION'].sum().sort_index()
-            else:
-                men_data = pd.Series()
-                
-            if has_women:
-                women_data = filtered_df[filtered_df['SEXO'] == 'MUJER'].groupby('grupo_edad')['FACTOR DE EXPANSION'].sum().sort_index()
-            else:
-                women_data = pd.Series()
-            
-            fig = go.Figure()
-            
-            if has_men:
-                fig.add_trace(go.Bar(
-                    y=men_data.index,
-                    x=-men_data.values,
-                    name='Hombres',
-                    orientation='h',
-                    marker_color='#6a0dad'
-                ))
-            
-            if has_women:
-                fig.add_trace(go.Bar(
-                    y=women_data.index,
-                    x=women_data.values,
-                    name='Mujeres',
-                    orientation='h',
-                    marker_color='#ba55d3'
-                ))
-            
-            fig.update_layout(
-                barmode='relative',
-                bargap=0.1,
-                xaxis_title="Población (Factor de Expansión)",
-                yaxis_title="Grupo de Edad",
-                font=dict(size=12)
-            )
-            
+            fig = figura_piramide(piramide)
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.warning("No hay suficientes datos para mostrar la pirámide poblacional.")
@@ -961,19 +1273,10 @@ elif page == "🔍 Análisis Demográfico":
         st.markdown('<div class="plot-container">', unsafe_allow_html=True)
         st.subheader("🎓 Distribución por Nivel Educativo")
         
-        if not filtered_df['NIVEL EDUCATIVO'].isna().all():
+        if not sin_datos('NIVEL EDUCATIVO'):
             # Utilizar FACTOR DE EXPANSION para la distribución educativa
-            education_counts = filtered_df.groupby('NIVEL EDUCATIVO')['FACTOR DE EXPANSION'].sum()
-            colors = get_purple_palette(len(education_counts))
-            
-            fig = px.pie(values=education_counts.values,
-                names=education_counts.index,
-                color_discrete_sequence=colors,
-                hole=0.4)
-            
-            fig.update_layout(
-                title="Distribución ponderada por Factor de Expansión"
-            )
+            education_counts = filtered_df.groupby('NIVEL EDUCATIVO', observed=True)['FACTOR DE EXPANSION'].sum()
+            fig = figura_educacion(education_counts)
             
             st.plotly_chart(fig, use_container_width=True)
         else:
@@ -981,14 +1284,19 @@ elif page == "🔍 Análisis Demográfico":
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Análisis de ingresos solo si hay datos de P2 válidos
-    if not filtered_df['P2'].isna().all():
+    if not sin_datos('P2'):
         st.markdown('<div class="plot-container">', unsafe_allow_html=True)
         st.subheader("💰 Análisis de Ingresos por Características Demográficas")
         
-        # Verificar si hay suficientes datos para cada grupo
-        valid_genders = [gender for gender in filtered_df['SEXO'].unique() if not pd.isna(gender) and not filtered_df[filtered_df['SEXO'] == gender]['P2'].isna().all()]
-        valid_education = [edu for edu in filtered_df['NIVEL EDUCATIVO'].unique() if not pd.isna(edu) and not filtered_df[filtered_df['NIVEL EDUCATIVO'] == edu]['P2'].isna().all()]
-        valid_age_groups = [age for age in filtered_df['grupo_edad'].unique() if not pd.isna(age) and not filtered_df[filtered_df['grupo_edad'] == age]['P2'].isna().all()]
+        # Grupos con al menos un ingreso válido: un conteo por grupo en una sola pasada
+        # (sort=False conserva el orden de aparición de los grupos)
+        def grupos_con_ingreso(col):
+            conteo = filtered_df.groupby(col, observed=True, sort=False)['P2'].count()
+            return conteo[conteo > 0].index.tolist()
+        
+        valid_genders = grupos_con_ingreso('SEXO')
+        valid_education = grupos_con_ingreso('NIVEL EDUCATIVO')
+        valid_age_groups = grupos_con_ingreso('grupo_edad')
         
         if valid_genders or valid_education or valid_age_groups:
             fig = make_subplots(
@@ -997,68 +1305,41 @@ elif page == "🔍 Análisis Demográfico":
                 specs=[[{"type": "box"}, {"type": "box"}, {"type": "box"}]]
             )
             
-            # Box plot por género - usando pesos con FACTOR DE EXPANSION
+            # Box plot por género - cuartiles ponderados por FACTOR DE EXPANSION
             if valid_genders:
                 for i, gender in enumerate(valid_genders):
-                    gender_data = filtered_df[filtered_df['SEXO'] == gender]
-                    data = gender_data['P2'].dropna()
-                    weights = gender_data['FACTOR DE EXPANSION'].dropna()
+                    gender_data = filtered_df[filtered_df['SEXO'] == gender].dropna(subset=['P2'])
                     
-                    if not data.empty and not weights.empty:
-                        # Repetir valores según el factor de expansión (redondeado)
-                        expanded_data = []
-                        for val, weight in zip(data, weights):
-                            # Usar un factor de escala más pequeño para manejar los pesos
-                            scaled_weight = max(1, round(weight / 10))
-                            expanded_data.extend([val] * scaled_weight)
-                        
-                        if expanded_data:
-                            fig.add_trace(
-                                go.Box(y=expanded_data, name=gender, marker_color=get_purple_palette(len(valid_genders))[i]),
-                                row=1, col=1
-                            )
+                    if not gender_data.empty:
+                        fig.add_trace(
+                            go.Box(name=gender, marker_color=get_purple_palette(len(valid_genders))[i],
+                                   **weighted_box_stats(gender_data['P2'], gender_data['FACTOR DE EXPANSION'])),
+                            row=1, col=1
+                        )
             
-            # Box plot por educación - usando pesos con FACTOR DE EXPANSION
+            # Box plot por educación - cuartiles ponderados por FACTOR DE EXPANSION
             if valid_education:
                 for i, edu in enumerate(valid_education):
-                    edu_data = filtered_df[filtered_df['NIVEL EDUCATIVO'] == edu]
-                    data = edu_data['P2'].dropna()
-                    weights = edu_data['FACTOR DE EXPANSION'].dropna()
+                    edu_data = filtered_df[filtered_df['NIVEL EDUCATIVO'] == edu].dropna(subset=['P2'])
                     
-                    if not data.empty and not weights.empty:
-                        # Repetir valores según el factor de expansión (redondeado)
-                        expanded_data = []
-                        for val, weight in zip(data, weights):
-                            # Usar un factor de escala más pequeño para manejar los pesos
-                            scaled_weight = max(1, round(weight / 10))
-                            expanded_data.extend([val] * scaled_weight)
-                        
-                        if expanded_data:
-                            fig.add_trace(
-                                go.Box(y=expanded_data, name=edu, marker_color=get_purple_palette(len(valid_education))[i]),
-                                row=1, col=2
-                            )
+                    if not edu_data.empty:
+                        fig.add_trace(
+                            go.Box(name=edu, marker_color=get_purple_palette(len(valid_education))[i],
+                                   **weighted_box_stats(edu_data['P2'], edu_data['FACTOR DE EXPANSION'])),
+                            row=1, col=2
+                        )
             
-            # Box plot por edad - usando pesos con FACTOR DE EXPANSION
+            # Box plot por edad - cuartiles ponderados por FACTOR DE EXPANSION
             if valid_age_groups:
                 for i, age in enumerate(valid_age_groups):
-                    age_data = filtered_df[filtered_df['grupo_edad'] == age]
-                    data = age_data['P2'].dropna()
-                    weights = age_data['FACTOR DE EXPANSION'].dropna()
+                    age_data = filtered_df[filtered_df['grupo_edad'] == age].dropna(subset=['P2'])
                     
-                    if not data.empty and not weights.empty:
-                        # Repetir valores según el factor de expansión (redondeado)
-                        expanded_data = []
-                        for val, weight in zip(data, weights):
-                            # Usar un factor de escala más pequeño para manejar los pesos
-                            scaled_weight = max(1, round(weight / 10))
-                            expanded_data.extend([val] * scaled_weight)
-                        
-                        if expanded_data:
-                            fig.add_trace(
-                                go.Box(y=expanded_data, name=age, marker_color=get_purple_palette(len(valid_age_groups))[i]),
-                                row=1, col=3
-                            )
+                    if not age_data.empty:
+                        fig.add_trace(
+                            go.Box(name=age, marker_color=get_purple_palette(len(valid_age_groups))[i],
+                                   **weighted_box_stats(age_data['P2'], age_data['FACTOR DE EXPANSION'])),
+                            row=1, col=3
+                        )
             
             fig.update_layout(
                 height=500,
@@ -1074,139 +1355,92 @@ elif page == "🔍 Análisis Demográfico":
     else:
         st.warning("No hay datos de ingresos disponibles para el análisis.")
 
-import pandas as pd
-import numpy as np
-import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-from scipy.stats import chi2_contingency
-from scipy.stats.contingency import association
-import warnings
-warnings.filterwarnings('ignore')
-
-def cramers_v(x, y, weights=None):
+def tabla_contingencia(codigos_x, codigos_y, pesos, n_filas, n_columnas):
     """
-    Calcula el coeficiente de Cramér's V para variables categóricas
-    con soporte para pesos (factor de expansión)
+    Construye la tabla de contingencia ponderada a partir de códigos enteros
+    en una sola pasada: cada par (fila, columna) se linealiza a un índice y
+    se acumulan los pesos con np.bincount
     """
-    try:
-        if weights is not None:
-            # Crear tabla de contingencia ponderada
-            crosstab = pd.crosstab(x, y, weights, aggfunc='sum')
-        else:
-            crosstab = pd.crosstab(x, y)
-        
-        # Verificar que la tabla no esté vacía
-        if crosstab.empty or crosstab.sum().sum() == 0:
-            return 0.0
-        
-        # Calcular chi-cuadrado
-        chi2, _, _, _ = chi2_contingency(crosstab)
-        n = crosstab.sum().sum()
-        
-        # Calcular Cramér's V
-        min_dim = min(crosstab.shape[0] - 1, crosstab.shape[1] - 1)
-        if min_dim == 0:
-            return 0.0
-        
-        cramers_v = np.sqrt(chi2 / (n * min_dim))
-        return min(cramers_v, 1.0)  # Limitar a 1.0
-    except:
-        return 0.0
+    indice = codigos_x.astype(np.int64, copy=False) * n_columnas + codigos_y
+    tabla = np.bincount(indice, weights=pesos, minlength=n_filas * n_columnas)
+    return tabla.reshape(n_filas, n_columnas)
 
-def calculate_association_matrix(df, variables, weights=None):
+def cramers_v_codes(codigos_x, codigos_y, pesos, mascara):
     """
-    Calcula matriz de asociación para variables categóricas
+    Calcula el coeficiente de Cramér's V a partir de códigos enteros ya
+    factorizados (pd.factorize), pesos y una máscara de filas válidas
     """
-    n_vars = len(variables)
-    association_matrix = np.zeros((n_vars, n_vars))
+    # Sin filas válidas no hay tabla (y .max() fallaría sobre los códigos vacíos)
+    if not mascara.any():
+        return 0.0
     
-    for i, var1 in enumerate(variables):
-        for j, var2 in enumerate(variables):
-            if i == j:
-                association_matrix[i, j] = 1.0
-            elif i < j:  # Solo calcular la mitad superior
-                # Remover valores nulos
-                valid_mask = df[var1].notna() & df[var2].notna()
-                if weights is not None:
-                    valid_mask = valid_mask & df[weights].notna()
-                
-                if valid_mask.sum() > 0:
-                    x = df.loc[valid_mask, var1]
-                    y = df.loc[valid_mask, var2]
-                    w = df.loc[valid_mask, weights] if weights is not None else None
-                    
-                    assoc_value = cramers_v(x, y, w)
-                    association_matrix[i, j] = assoc_value
-                    association_matrix[j, i] = assoc_value  # Matriz simétrica
+    crosstab = tabla_contingencia(codigos_x[mascara], codigos_y[mascara], pesos[mascara],
+                                  codigos_x.max() + 1, codigos_y.max() + 1)
     
-    return association_matrix
-
-import pandas as pd
-import numpy as np
-import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-from scipy.stats import chi2_contingency
-from scipy.stats.contingency import association
-import warnings
-warnings.filterwarnings('ignore')
-
-def cramers_v(x, y, weights=None):
-    """
-    Calcula el coeficiente de Cramér's V para variables categóricas
-    con soporte para pesos (factor de expansión)
-    """
-    try:
-        if weights is not None:
-            # Crear tabla de contingencia ponderada
-            crosstab = pd.crosstab(x, y, weights, aggfunc='sum')
-        else:
-            crosstab = pd.crosstab(x, y)
-        
-        # Verificar que la tabla no esté vacía
-        if crosstab.empty or crosstab.sum().sum() == 0:
-            return 0.0
-        
-        # Calcular chi-cuadrado
-        chi2, _, _, _ = chi2_contingency(crosstab)
-        n = crosstab.sum().sum()
-        
-        # Calcular Cramér's V
-        min_dim = min(crosstab.shape[0] - 1, crosstab.shape[1] - 1)
-        if min_dim == 0:
-            return 0.0
-        
-        cramers_v = np.sqrt(chi2 / (n * min_dim))
-        return min(cramers_v, 1.0)  # Limitar a 1.0
-    except:
+    # Los códigos vienen de la columna completa: quitar niveles sin observaciones en el par
+    crosstab = crosstab[crosstab.sum(axis=1) > 0][:, crosstab.sum(axis=0) > 0]
+    
+    # Se necesitan al menos dos niveles por variable y peso total positivo
+    if crosstab.shape[0] < 2 or crosstab.shape[1] < 2 or crosstab.sum() <= 0:
         return 0.0
+    
+    min_dim = min(crosstab.shape[0] - 1, crosstab.shape[1] - 1)
+    
+    # Calcular chi-cuadrado con las frecuencias esperadas bajo independencia
+    # (sin filas ni columnas vacías, ninguna esperada es 0)
+    totales_filas = crosstab.sum(axis=1)
+    totales_columnas = crosstab.sum(axis=0)
+    n = totales_filas.sum()
+    esperadas = np.outer(totales_filas, totales_columnas) / n
+    
+    # Corrección de Yates para tablas 2x2 (un grado de libertad), igual que scipy
+    diferencia = crosstab - esperadas
+    if crosstab.shape == (2, 2):
+        diferencia = np.sign(diferencia) * np.maximum(np.abs(diferencia) - 0.5, 0)
+    chi2 = (diferencia ** 2 / esperadas).sum()
+    
+    # Calcular Cramér's V
+    cramers_v = np.sqrt(chi2 / (n * min_dim))
+    return min(cramers_v, 1.0)  # Limitar a 1.0
 
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: huella_df})
 def calculate_association_matrix(df, variables, weights=None):
     """
     Calcula matriz de asociación para variables categóricas
+    (cacheada: se recalcula solo si cambian los datos o la lista de variables)
     """
     n_vars = len(variables)
     association_matrix = np.zeros((n_vars, n_vars))
     
-    for i, var1 in enumerate(variables):
-        for j, var2 in enumerate(variables):
-            if i == j:
-                association_matrix[i, j] = 1.0
-            elif i < j:  # Solo calcular la mitad superior
-                # Remover valores nulos
-                valid_mask = df[var1].notna() & df[var2].notna()
-                if weights is not None:
-                    valid_mask = valid_mask & df[weights].notna()
-                
-                if valid_mask.sum() > 0:
-                    x = df.loc[valid_mask, var1]
-                    y = df.loc[valid_mask, var2]
-                    w = df.loc[valid_mask, weights] if weights is not None else None
-                    
-                    assoc_value = cramers_v(x, y, w)
-                    association_matrix[i, j] = assoc_value
-                    association_matrix[j, i] = assoc_value  # Matriz simétrica
+    # Cada variable se factoriza una sola vez; los pares trabajan con códigos enteros
+    codigos = {}
+    no_nulos = {}
+    for var in variables:
+        codigos[var], _ = pd.factorize(df[var])
+        no_nulos[var] = codigos[var] >= 0
+    
+    if weights is not None:
+        pesos = df[weights].to_numpy(dtype=np.float64, na_value=np.nan)
+        pesos_validos = ~np.isnan(pesos)
+    else:
+        pesos = np.ones(len(df))
+        pesos_validos = np.ones(len(df), dtype=bool)
+    
+    np.fill_diagonal(association_matrix, 1.0)
+    
+    # Solo la mitad superior; la matriz es simétrica
+    for i, j in combinations(range(n_vars), 2):
+        var1, var2 = variables[i], variables[j]
+        # Remover valores nulos
+        valid_mask = no_nulos[var1] & no_nulos[var2] & pesos_validos
+        
+        # Con menos de dos filas válidas la asociación queda en 0
+        if np.count_nonzero(valid_mask) < 2:
+            continue
+        
+        assoc_value = cramers_v_codes(codigos[var1], codigos[var2], pesos, valid_mask)
+        association_matrix[i, j] = assoc_value
+        association_matrix[j, i] = assoc_value
     
     return association_matrix
 
@@ -1234,36 +1468,26 @@ if page == "🎪 Participación Cultural":
         }
         
         # Verificar que hay datos de género
-        if not df['SEXO'].isna().all():
-            # Calcular participación por género ponderada por FACTOR DE EXPANSION
-            gender_participation = {}
+        if nulos['SEXO'] < len(df):
+            # Calcular participación por género ponderada por FACTOR DE EXPANSION:
+            # numerador y denominador salen de productos matriciales con la matriz
+            # indicadora de género (una columna por género observado)
+            actividades_presentes = {activity: col_name for activity, col_name in cultural_activities.items()
+                                     if col_name in df.columns}
             
-            for activity, col_name in cultural_activities.items():
-                if col_name in df.columns:
-                    # Para cada género, calcular la suma ponderada de participación
-                    activity_by_gender = {}
-                    for gender in df['SEXO'].dropna().unique():
-                        gender_df = df[df['SEXO'] == gender]
-                        yes_responses = gender_df[gender_df[col_name] == 'SI']['FACTOR DE EXPANSION'].sum()
-                        total_weight = gender_df['FACTOR DE EXPANSION'].sum()
-                        participation_pct = (yes_responses / total_weight * 100) if total_weight > 0 else 0
-                        activity_by_gender[gender] = participation_pct
-                    
-                    gender_participation[activity] = activity_by_gender
-            
-            if gender_participation:
-                # Convertir a DataFrame para graficación
-                gender_participation_df = pd.DataFrame()
+            if actividades_presentes:
+                pesos = df['FACTOR DE EXPANSION'].to_numpy(dtype=np.float64)
+                respuestas_si = df[list(actividades_presentes.values())].eq('SI').to_numpy(dtype=bool, na_value=False)
                 
-                for activity, gender_data in gender_participation.items():
-                    temp_df = pd.DataFrame.from_dict(gender_data, orient='index', columns=[activity])
-                    if gender_participation_df.empty:
-                        gender_participation_df = temp_df
-                    else:
-                        gender_participation_df = gender_participation_df.join(temp_df, how='outer')
+                codigos_genero, generos = pd.factorize(df['SEXO'], sort=True)
+                indicadora = (codigos_genero[:, None] == np.arange(len(generos))).astype(np.float64)
                 
-                # Transponer para el formato correcto
-                gender_df = gender_participation_df.T
+                yes_responses = indicadora.T @ (respuestas_si * pesos[:, None])
+                total_weight = indicadora.T @ pesos
+                
+                # Filas: actividades; columnas: géneros
+                gender_df = pd.DataFrame((yes_responses / total_weight[:, None] * 100).T,
+                                         index=list(actividades_presentes), columns=list(generos))
                 
                 if not gender_df.empty:
                     fig = px.bar(gender_df, 
@@ -1290,21 +1514,14 @@ if page == "🎪 Participación Cultural":
         st.subheader("🌈 Participación por Etnia")
         
         # Verificar si hay datos de etnia y participación cultural
-        if not df['ETNIA'].isna().all() and not df['indice_cultural'].isna().all():
-            # Calcular participación cultural por etnia ponderada por FACTOR DE EXPANSION
-            ethnicity_participation = {}
-            
-            for ethnicity in df['ETNIA'].dropna().unique():
-                ethnicity_df = df[df['ETNIA'] == ethnicity]
-                # Calcular el promedio ponderado del índice cultural
-                avg_participation = np.average(
-                    ethnicity_df['indice_cultural'].dropna(),
-                    weights=ethnicity_df['FACTOR DE EXPANSION'].dropna()
-                ) if not ethnicity_df['indice_cultural'].dropna().empty else 0
-                ethnicity_participation[ethnicity] = avg_participation
+        if nulos['ETNIA'] < len(df) and nulos['indice_cultural'] < len(df):
+            # Promedio ponderado del índice cultural por etnia (FACTOR DE EXPANSION) con dos
+            # sumas agrupadas; el peso solo cuenta donde hay índice, y las etnias sin índice quedan en 0
+            indice = df['indice_cultural']
+            suma_ponderada = (indice * df['FACTOR DE EXPANSION']).groupby(df['ETNIA'], observed=True, sort=False).sum()
+            suma_pesos = df['FACTOR DE EXPANSION'].where(indice.notna()).groupby(df['ETNIA'], observed=True, sort=False).sum()
             
-            # Convertir a Series para graficación
-            ethnicity_participation = pd.Series(ethnicity_participation).sort_values(ascending=True)
+            ethnicity_participation = (suma_ponderada / suma_pesos).fillna(0).sort_values(ascending=True)
             
             if not ethnicity_participation.empty:
                 colors = get_purple_palette(len(ethnicity_participation))
@@ -1356,77 +1573,35 @@ if page == "🎪 Participación Cultural":
     cultural_categorical_vars = list(set([var for var in cultural_categorical_vars if var in df.columns]))
     
     if len(cultural_categorical_vars) >= 2:
-        # Filtrar variables con suficiente variación
-        valid_vars = []
-        for var in cultural_categorical_vars:
-            if df[var].nunique() > 1 and df[var].notna().sum() > 10:
-                valid_vars.append(var)
+        # Filtrar variables con suficiente variación (valores únicos y no nulos en una sola pasada)
+        estadisticas = df[cultural_categorical_vars].agg(['nunique', 'count'])
+        valid_vars = estadisticas.columns[
+            (estadisticas.loc['nunique'] > 1) & (estadisticas.loc['count'] > 10)
+        ].tolist()
         
         if len(valid_vars) >= 2:
             # Limitar a máximo 10 variables para mejor visualización
             if len(valid_vars) > 10:
                 # Seleccionar las variables con mayor variación
-                var_info = [(var, df[var].nunique()) for var in valid_vars]
-                var_info.sort(key=lambda x: x[1], reverse=True)
-                valid_vars = [var for var, _ in var_info[:10]]
+                valid_vars = estadisticas.loc['nunique', valid_vars].astype(int).nlargest(10).index.tolist()
             
             st.info(f"Analizando {len(valid_vars)} variables culturales categóricas")
             
             # Calcular matriz de asociación
             try:
-                association_matrix = calculate_association_matrix(df, valid_vars, 'FACTOR DE EXPANSION')
+                association_matrix = calculate_association_matrix(df, tuple(valid_vars), 'FACTOR DE EXPANSION')
                 
-                # Crear nombres más legibles y únicos
+                # Crear nombres más legibles y únicos (los repetidos llevan sufijo " (n)")
                 readable_names = []
-                name_counts = {}
+                repeticiones = {}
                 
                 for var in valid_vars:
-                    if 'asistencia' in var.lower():
-                        base_name = var.replace('ASISTENCIA ', '').replace('_', ' ').title()
-                        if 'biblioteca' in var.lower():
-                            name = 'Bibliotecas'
-                        elif 'museo' in var.lower():
-                            name = 'Museos'
-                        elif 'casa' in var.lower():
-                            name = 'Casas de Cultura'
-                        elif 'centro' in var.lower():
-                            name = 'Centros Culturales'
-                        elif 'exposicion' in var.lower():
-                            name = 'Exposiciones'
-                        elif 'monumento' in var.lower():
-                            name = 'Monumentos'
-                        elif 'curso' in var.lower():
-                            name = 'Cursos'
-                        else:
-                            name = base_name
-                    elif 'p3' in var.lower():
-                        name = 'Teatro/Danza'
-                    elif 'p4' in var.lower():
-                        name = 'Conciertos'
-                    elif 'p5' in var.lower():
-                        name = 'Música en Bares'
-                    elif 'practica' in var.lower():
-                        name = 'Práctica Cultural'
-                    elif 'lectura' in var.lower():
-                        if 'libro' in var.lower():
-                            name = 'Lectura Libros'
-                        elif 'revista' in var.lower():
-                            name = 'Lectura Revistas'
-                        elif 'periodico' in var.lower():
-                            name = 'Lectura Periódicos'
-                        else:
-                            name = f"Lectura ({var.split('_')[-1] if '_' in var else 'General'})"
+                    name = nombre_legible(var)
+                    if name in repeticiones:
+                        repeticiones[name] += 1
+                        name = f"{name} ({repeticiones[name]})"
                     else:
-                        name = var.replace('_', ' ').title()
-                    
-                    # Asegurar nombres únicos
-                    original_name = name
-                    counter = 1
-                    while name in name_counts:
-                        name = f"{original_name} ({counter})"
-                        counter += 1
-                    
-                    name_counts[name] = True
+                        repeticiones[name] = 0
                     readable_names.append(name)
                 
                 # Crear DataFrame para la visualización
@@ -1522,56 +1697,17 @@ elif page == "📚 Actividades Específicas":
     selected_activity = st.selectbox("Selecciona una actividad cultural:", list(activities_dict.keys()))
     activity_col = activities_dict[selected_activity]
     
-    # Análisis de la actividad seleccionada
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        # Calcular tasa de participación ponderada por FACTOR DE EXPANSION
-        if 'FACTOR DE EXPANSION' in df.columns:
-            yes_weight = df[df[activity_col] == 'SI']['FACTOR DE EXPANSION'].sum()
-            total_weight = df['FACTOR DE EXPANSION'].sum()
-            participation_rate = (yes_weight / total_weight * 100) if total_weight > 0 else 0
-        else:
-            participation_rate = (df[activity_col] == 'SI').mean() * 100
-            
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Tasa de Participación", f"{participation_rate:.1f}%")
-        st.markdown("<small>Ponderada por Factor de Expansión</small>", unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col2:
-        # Calcular total de participantes expandido usando FACTOR DE EXPANSION
-        if 'FACTOR DE EXPANSION' in df.columns:
-            total_participants = df[df[activity_col] == 'SI']['FACTOR DE EXPANSION'].sum()
-        else:
-            total_participants = (df[activity_col] == 'SI').sum()
-            
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Total Participantes", f"{int(total_participants):,}")
-        st.markdown("<small>Expandido a la población</small>", unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+    # Análisis de la actividad seleccionada (cacheado por actividad)
+    resumen = resumen_actividad(df, activity_col)
+    participation_rate = resumen['participation_rate']
+    total_participants = resumen['total_participants']
+    max_group = resumen['max_group']
     
-    with col3:
-        # Calcular el grupo demográfico con mayor participación ponderada
-        if 'FACTOR DE EXPANSION' in df.columns:
-            # Calcular tasa de participación ponderada por grupo de edad
-            age_participation_rates = {}
-            for age in df['grupo_edad'].dropna().unique():
-                age_df = df[df['grupo_edad'] == age]
-                yes_weight = age_df[age_df[activity_col] == 'SI']['FACTOR DE EXPANSION'].sum()
-                total_weight = age_df['FACTOR DE EXPANSION'].sum()
-                rate = (yes_weight / total_weight * 100) if total_weight > 0 else 0
-                age_participation_rates[age] = rate
-            
-            # Encontrar el grupo con mayor tasa de participación
-            max_group = max(age_participation_rates.items(), key=lambda x: x[1])[0]
-        else:
-            max_group = df.groupby('grupo_edad')[activity_col].apply(lambda x: (x == 'SI').mean()).idxmax()
-            
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Grupo Más Activo", max_group)
-        st.markdown("<small>Según Factor de Expansión</small>", unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+    mostrar_tarjetas([
+        ("Tasa de Participación", f"{participation_rate:.1f}%", "Ponderada por Factor de Expansión"),
+        ("Total Participantes", f"{int(total_participants):,}", "Expandido a la población"),
+        ("Grupo Más Activo", max_group, "Según Factor de Expansión"),
+    ])
     
     # Gráficos de análisis
     col1, col2 = st.columns(2)
@@ -1580,22 +1716,8 @@ elif page == "📚 Actividades Específicas":
         st.markdown('<div class="plot-container">', unsafe_allow_html=True)
         st.subheader(f"📊 {selected_activity} por Grupo de Edad")
         
-        # Calcular participación por edad ponderada por FACTOR DE EXPANSION
-        age_participation = {}
-        for age in df['grupo_edad'].dropna().unique():
-            age_df = df[df['grupo_edad'] == age]
-            yes_weight = age_df[age_df[activity_col] == 'SI']['FACTOR DE EXPANSION'].sum()
-            total_weight = age_df['FACTOR DE EXPANSION'].sum()
-            rate = (yes_weight / total_weight * 100) if total_weight > 0 else 0
-            age_participation[age] = rate
-        
-        # Convertir a DataFrame para graficación
-        age_participation_df = pd.DataFrame({
-            'grupo_edad': list(age_participation.keys()),
-            'participacion': list(age_participation.values())
-        })
-        
-        fig = px.bar(age_participation_df,
+        # Participación por edad ponderada por FACTOR DE EXPANSION
+        fig = px.bar(resumen['age_participation_df'],
                     x='grupo_edad',
                     y='participacion',
                     color='participacion',
@@ -1613,22 +1735,8 @@ elif page == "📚 Actividades Específicas":
         st.markdown('<div class="plot-container">', unsafe_allow_html=True)
         st.subheader(f"📈 {selected_activity} por Nivel Educativo")
         
-        # Calcular participación por nivel educativo ponderada por FACTOR DE EXPANSION
-        edu_participation = {}
-        for edu in df['NIVEL EDUCATIVO'].dropna().unique():
-            edu_df = df[df['NIVEL EDUCATIVO'] == edu]
-            yes_weight = edu_df[edu_df[activity_col] == 'SI']['FACTOR DE EXPANSION'].sum()
-            total_weight = edu_df['FACTOR DE EXPANSION'].sum()
-            rate = (yes_weight / total_weight * 100) if total_weight > 0 else 0
-            edu_participation[edu] = rate
-        
-        # Convertir a DataFrame para graficación
-        edu_participation_df = pd.DataFrame({
-            'nivel_educativo': list(edu_participation.keys()),
-            'participacion': list(edu_participation.values())
-        }).sort_values('participacion', ascending=False)
-        
-        fig = px.bar(edu_participation_df,
+        # Participación por nivel educativo ponderada por FACTOR DE EXPANSION
+        fig = px.bar(resumen['edu_participation_df'],
                     x='nivel_educativo',
                     y='participacion',
                     color='participacion',
@@ -1641,4 +1749,13 @@ elif page == "📚 Actividades Específicas":
             xaxis_tickangle=-45
         )
         st.plotly_chart(fig, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
\ No newline at end of file
+        st.markdown('</div>', unsafe_allow_html=True)
+
+# =============================================================================
+# VERIFICACIÓN DEL DATAFRAME COMPARTIDO (MODO DEBUG)
+# =============================================================================
+
+# df viene de st.cache_resource y lo comparten todas las sesiones, así que
+# ninguna página debe modificarlo (ni su forma ni sus valores)
+if MODO_DEBUG and huella_contenido(df) != huella_inicial:
+    raise RuntimeError("El DataFrame compartido de load_and_process_data fue modificado")